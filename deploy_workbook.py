@@ -5,7 +5,8 @@ Tableau Deployment Script
 This script provides multiple functionalities for managing Tableau content.
 
 Primary new functionality (run with --config):
-  - Migrates a workbook based on a JSON configuration file.
+  - Migrates a workbook based on a JSON configuration file
+    (or several in parallel when the file holds a list of configurations).
     It downloads a workbook, modifies a URL within its XML content,
     re-packages it, and publishes it to a destination.
 
@@ -20,18 +21,41 @@ Original functionalities (run without arguments for an interactive menu):
 import os
 import re
 import sys
+import copy
 import time
+import struct
 import zipfile
 import shutil
+import tempfile
+import threading
 import logging
 import json
+import requests
 import tableauserverclient as TSC
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from xml.etree import ElementTree as ET
-from tableauhyperapi import HyperProcess, Connection, Telemetry
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    # orjson parses large (list) configs several times faster; fall back to the stdlib when absent.
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
 
 # ------------- CONFIGURATION -------------
 LOCAL_DIRECTORY = r"C:\temp\DataFiles"
+COPY_BUFFER_SIZE = 1 << 20  # Buffer size used when streaming archive members
+SESSION_CACHE_DIR = tempfile.gettempdir()
+SESSION_TTL_SECONDS = 230 * 60  # Tableau sessions expire after 240 minutes by default; 0 disables caching
+MAX_PARALLEL_MIGRATIONS = 8  # Upper bound on workbooks migrated concurrently from a list config
+DOWNLOAD_ATTEMPTS = 2  # Source downloads tried when the downloaded workbook cannot be repackaged
+PUBLISH_CHUNK_SIZE_MB = 64  # Tableau's maximum chunk size for the chunked publish upload
+
+# TSC reads its upload chunk size from the environment on every publish (default 50 MB).
+os.environ.setdefault("TSC_CHUNK_SIZE_MB", str(PUBLISH_CHUNK_SIZE_MB))
 
 # Environments for Tableau connections. Adjust tokens, URLs, and site names as needed.
 ENVIRONMENTS = {
@@ -55,46 +79,254 @@ ENVIRONMENTS = {
     }
 }
 
+HYPER_DBNAME_PATTERN = re.compile(rb"(dbname\s*=\s*')([^']+\.hyper)(')")
+
+# Session tokens written to the cache by this process; these are left signed in for reuse.
+_PERSISTED_TOKENS = set()
+# Serialises sign-in per environment so parallel migrations reuse the first session.
+_AUTH_LOCKS = {env: threading.Lock() for env in ENVIRONMENTS}
+# The live session per environment, shared by every migration in this process: each new PAT sign-in ends
+# the previous session for that token, so workers must never sign in separately. Guarded by _AUTH_LOCKS.
+_SHARED_SESSIONS = {}
+
 # ------------- UTILITY FUNCTIONS -------------
-def ensure_local_directory():
-    if not os.path.exists(LOCAL_DIRECTORY):
-        os.makedirs(LOCAL_DIRECTORY)
-        log_message(f"Created local directory: {LOCAL_DIRECTORY}")
+def ensure_local_directory(directory=LOCAL_DIRECTORY):
+    try:
+        os.makedirs(directory)
+    except FileExistsError:
+        return
+    log_message(f"Created local directory: {directory}")
+
+# Try the operation and treat "not found" as done, rather than paying an extra exists() stat first.
+def remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def remove_tree(path):
+    try:
+        shutil.rmtree(path)
+    except FileNotFoundError:
+        pass
 
 def log_message(message):
-    print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {message}")
+    # Emit the line and its newline in a single write so lines from parallel migrations don't interleave.
+    print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {message}\n", end="")
 
 # ------------- TABLEAU SERVER AUTHENTICATION -------------
+def _session_cache_path(env):
+    return os.path.join(SESSION_CACHE_DIR, f"tableau_session_{env}.json")
+
+def _restore_cached_session(env, server):
+    """Reuses a still-valid session token saved by a previous run. Returns True on success."""
+    try:
+        with open(_session_cache_path(env), 'r') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if cached.get("server_url") != ENVIRONMENTS[env]["server_url"] or time.time() - cached.get("timestamp", 0) > SESSION_TTL_SECONDS:
+        return False
+
+    server._set_auth(cached["site_id"], cached["user_id"], cached["auth_token"])
+    try:
+        # Cheapest authenticated call; fails with 401 if the token was revoked or expired.
+        server.projects.get(TSC.RequestOptions(pagesize=1))
+    except Exception as e:
+        log_message(f"Cached session for {env} is no longer valid ({e}). Signing in again.")
+        server._clear_auth()
+        return False
+    return True
+
+def _save_session(env, server):
+    cache_path = _session_cache_path(env)
+    tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    session = {
+        "server_url": ENVIRONMENTS[env]["server_url"],
+        "site_id": server.site_id,
+        "user_id": server.user_id,
+        "auth_token": server.auth_token,
+        "timestamp": time.time(),
+    }
+    try:
+        # The file holds a live session token, so keep it readable by the current user only.
+        with os.fdopen(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as f:
+            json.dump(session, f)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        log_message(f"Warning: Could not cache the {env} session. Error: {e}")
+        return
+    _PERSISTED_TOKENS.add(server.auth_token)
+
 def authenticate(env):
     if env not in ENVIRONMENTS:
         log_message(f"ERROR: Environment '{env}' not found in configuration.")
         return None
+    with _AUTH_LOCKS[env]:
+        shared = _SHARED_SESSIONS.get(env)
+        if shared:
+            server = _new_server(env)
+            server._set_auth(shared["site_id"], shared["user_id"], shared["auth_token"])
+            shared["users"] += 1
+            log_message(f"Reusing the active session for {env} environment.")
+            return server
+
+        server = _authenticate(env)
+        _SHARED_SESSIONS[env] = {
+            "site_id": server.site_id,
+            "user_id": server.user_id,
+            "auth_token": server.auth_token,
+            "users": 1,
+        }
+        return server
+
+def _build_http_session():
+    """HTTP session for a TSC Server: pooled keep-alive connections plus retries on gateway errors."""
+    session = requests.Session()
+    # Only idempotent reads are retried: the chunked publish appends each upload chunk with PUT, and
+    # re-sending one the server already appended would corrupt the upload.
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=8,
+        max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504],
+                          allowed_methods=frozenset({"GET", "HEAD"}))
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def _new_server(env):
+    return TSC.Server(ENVIRONMENTS[env]["server_url"], use_server_version=True, session_factory=_build_http_session)
+
+def _authenticate(env):
     config = ENVIRONMENTS[env]
+    server = _new_server(env)
+    if SESSION_TTL_SECONDS and _restore_cached_session(env, server):
+        _PERSISTED_TOKENS.add(server.auth_token)
+        log_message(f"Reusing cached session for {env} environment ({config['server_url']}).")
+        return server
+
     tableau_auth = TSC.PersonalAccessTokenAuth(
         config["token_name"],
         config["personal_access_token"],
         config["site_name"]
     )
-    server = TSC.Server(config["server_url"], use_server_version=True)
     server.auth.sign_in(tableau_auth)
     log_message(f"Successfully authenticated to {env} environment ({config['server_url']}).")
+    if SESSION_TTL_SECONDS:
+        _save_session(env, server)
     return server
 
+def sign_out(server):
+    """
+    Signs out once no other migration is using the session, and never when the session is cached on disk
+    for the next run (signing out would revoke it).
+    """
+    for env, shared in list(_SHARED_SESSIONS.items()):
+        if shared["auth_token"] != server.auth_token:
+            continue
+        with _AUTH_LOCKS[env]:
+            if _SHARED_SESSIONS.get(env) is not shared:
+                break
+            shared["users"] -= 1
+            if shared["users"]:
+                return
+            # Sign out under the lock so a concurrent authenticate() cannot pick up the token being revoked.
+            del _SHARED_SESSIONS[env]
+            if server.auth_token not in _PERSISTED_TOKENS:
+                server.auth.sign_out()
+        return
+    if server.auth_token in _PERSISTED_TOKENS:
+        return
+    server.auth.sign_out()
+
+# Project IDs are stable for a given server/site, so lookups are cached for the lifetime of the process.
+_PROJECT_CACHE = {}
+
+def _can_filter_on(value):
+    # Tableau rejects '&' and ',' in REST filter values, even URL-encoded, and TSC does not escape them.
+    return '&' not in value and ',' not in value
+
+def _lookup_project(server, name, parent=None, top_level=False):
+    """Queries one project by name, optionally pinned to a parent project or to the top level."""
+    def in_scope(p):
+        if parent:
+            return p.parent_id == parent.id
+        return not p.parent_id if top_level else True
+
+    if _can_filter_on(name):
+        matching_projects = _get_filtered_projects(server, name, parent, top_level)
+        if matching_projects:
+            return matching_projects[0]
+
+    # Unfilterable names, a rejected filter, or a case mismatch (the Name filter is case-sensitive)
+    # fall back to a paged case-insensitive scan.
+    return next((p for p in TSC.Pager(server.projects) if p.name.lower() == name.lower() and in_scope(p)), None)
+
+def _get_filtered_projects(server, name, parent, top_level):
+    req_option = TSC.RequestOptions()
+    req_option.filter.add(TSC.Filter(TSC.RequestOptions.Field.Name,
+                                     TSC.RequestOptions.Operator.Equals,
+                                     name))
+    if parent:
+        req_option.filter.add(TSC.Filter(TSC.RequestOptions.Field.ParentProjectId,
+                                         TSC.RequestOptions.Operator.Equals,
+                                         parent.id))
+    elif top_level:
+        req_option.filter.add(TSC.Filter(TSC.RequestOptions.Field.TopLevelProject,
+                                         TSC.RequestOptions.Operator.Equals,
+                                         "true"))
+    try:
+        matching_projects, _ = server.projects.get(req_option)
+    except TSC.ServerResponseError as e:
+        log_message(f"Project filter for '{name}' was rejected ({e}); scanning all projects instead.")
+        return []
+    return matching_projects
+
 def find_project_by_name(server, project_name):
-    """Finds a project on the server by its name."""
+    """Finds a project on the server by its name, or by a nested path such as 'Parent/Child'."""
     if project_name.startswith('/'):
         project_name = project_name[1:]
-        
-    all_projects, _ = server.projects.get()
-    for project in all_projects:
-        if project.name.lower() == project_name.lower():
-            log_message(f"Found project '{project.name}' with ID: {project.id}")
-            return project
-    return None
+
+    cache_key = (server.server_address, server.site_id, project_name.lower())
+    if cache_key in _PROJECT_CACHE:
+        return _PROJECT_CACHE[cache_key]
+
+    project = None
+    segments = project_name.split('/')
+    if len(segments) > 1:
+        # Resolve the path one level at a time, so leaf names shared by different parents stay unambiguous.
+        for depth, segment in enumerate(segments):
+            project = _lookup_project(server, segment, parent=project, top_level=depth == 0)
+            if not project:
+                break
+    if not project:
+        # Also covers single names and project names that themselves contain '/'.
+        project = _lookup_project(server, project_name)
+
+    if project:
+        log_message(f"Found project '{project.name}' with ID: {project.id}")
+        _PROJECT_CACHE[cache_key] = project
+    return project
 
 # ------------- NEW WORKBOOK MIGRATION WORKFLOW (from JSON) -------------
 
-def process_workbook_migration(config):
+def process_workbook_migrations(configs):
+    """Migrates a list of workbook configs concurrently, each worker with its own servers and work folder."""
+    log_message(f"--- Migrating {len(configs)} workbooks ---")
+
+    def run(indexed_config):
+        index, config = indexed_config
+        work_dir = os.path.join(LOCAL_DIRECTORY, f"{index}_{config.get('workbook_name', 'workbook')}")
+        try:
+            process_workbook_migration(config, work_dir)
+        except Exception as e:
+            log_message(f"ERROR: Migration of workbook '{config.get('workbook_name')}' failed. {e}")
+
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_PARALLEL_MIGRATIONS, len(configs)))) as executor:
+        list(executor.map(run, enumerate(configs)))
+
+def process_workbook_migration(config, work_dir=LOCAL_DIRECTORY):
     """Orchestrates the entire workbook migration process based on the config file."""
     log_message("--- Starting Workbook Migration Process ---")
     
@@ -106,41 +338,65 @@ def process_workbook_migration(config):
     url_find = config["url_replacement"]["find"]
     url_replace = config["url_replacement"]["replace"]
 
-    ensure_local_directory()
-    
-    source_server = authenticate(source_env)
-    if not source_server: return
-    
-    downloaded_twbx_path = download_workbook_from_project(source_server, workbook_name, source_project_name)
-    source_server.auth.sign_out()
-    if not downloaded_twbx_path:
-        log_message("Halting process due to download failure.")
-        return
-        
-    modified_twbx_path = modify_and_repackage_workbook(downloaded_twbx_path, workbook_name, url_find, url_replace)
-    if not modified_twbx_path:
-        log_message("Halting process due to modification/repackaging failure.")
-        return
-
-    dest_server = authenticate(dest_env)
-    if not dest_server: return
+    ensure_local_directory(work_dir)
 
-    publish_modified_workbook(dest_server, modified_twbx_path, workbook_name, dest_project_name)
-    dest_server.auth.sign_out()
+    # A second sign-in with the same PAT ends the first session, so a same-environment run uses one session.
+    same_env = source_env == dest_env
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # The destination sign-in does not depend on the download/repackage steps, so overlap it with them.
+        dest_future = None if same_env else executor.submit(authenticate, dest_env)
+        dest_server = None
+        try:
+            source_server = authenticate(source_env)
+            if not source_server: return
+            if same_env:
+                dest_server = source_server
+
+            # Stay signed in to the source until repackaging succeeds, so a corrupt download can be
+            # fetched again without another sign-in.
+            try:
+                for attempt in range(1, DOWNLOAD_ATTEMPTS + 1):
+                    downloaded_twbx_path = download_workbook_from_project(source_server, workbook_name, source_project_name, work_dir)
+                    if not downloaded_twbx_path:
+                        log_message("Halting process due to download failure.")
+                        return
+
+                    modified_twbx_path = modify_and_repackage_workbook(downloaded_twbx_path, workbook_name, url_find, url_replace, work_dir)
+                    if modified_twbx_path:
+                        break
+                    if attempt < DOWNLOAD_ATTEMPTS:
+                        log_message(f"Repackaging failed; downloading the workbook again (attempt {attempt + 1} of {DOWNLOAD_ATTEMPTS})...")
+                else:
+                    log_message("Halting process due to modification/repackaging failure.")
+                    return
+            finally:
+                if not same_env:
+                    sign_out(source_server)
+
+            if not same_env:
+                dest_server = dest_future.result()
+            if not dest_server: return
+
+            publish_modified_workbook(dest_server, modified_twbx_path, workbook_name, dest_project_name)
+        finally:
+            if dest_server is None and dest_future is not None and not dest_future.cancel() and dest_future.exception() is None:
+                dest_server = dest_future.result()
+            if dest_server:
+                sign_out(dest_server)
 
     log_message("Cleaning up temporary files...")
     try:
-        if os.path.exists(downloaded_twbx_path):
-            os.remove(downloaded_twbx_path)
-        if os.path.exists(modified_twbx_path):
-            os.remove(modified_twbx_path)
+        remove_file(downloaded_twbx_path)
+        remove_file(modified_twbx_path)
+        if work_dir != LOCAL_DIRECTORY:
+            os.rmdir(work_dir)
         log_message("Cleanup complete.")
     except Exception as e:
         log_message(f"Warning: Could not clean up all temporary files. Error: {e}")
 
     log_message("--- Workbook Migration Process Finished ---")
 
-def download_workbook_from_project(server, workbook_name, project_name):
+def download_workbook_from_project(server, workbook_name, project_name, work_dir=LOCAL_DIRECTORY):
     """Downloads a specific workbook from a specific project."""
     log_message(f"Attempting to download workbook '{workbook_name}' from project '{project_name}'...")
     project = find_project_by_name(server, project_name)
@@ -148,113 +404,162 @@ def download_workbook_from_project(server, workbook_name, project_name):
         log_message(f"ERROR: Source project '{project_name}' not found.")
         return None
 
+    # Narrow by workbook and project name on the server, then pin the project by ID locally: the workbooks
+    # endpoint has no projectId filter, and projectName also matches same-named projects elsewhere. The Pager
+    # walks every page, since one name is often copied into many projects.
     req_option = TSC.RequestOptions()
-    req_option.filter.add(TSC.Filter(TSC.RequestOptions.Field.Name,
-                                     TSC.RequestOptions.Operator.Equals,
-                                     workbook_name))
-    req_option.filter.add(TSC.Filter(TSC.RequestOptions.Field.ProjectName,
-                                     TSC.RequestOptions.Operator.Equals,
-                                     project.name))
-    
-    matching_workbooks, _ = server.workbooks.get(req_option)
-    
-    if not matching_workbooks:
+    if _can_filter_on(workbook_name):
+        req_option.filter.add(TSC.Filter(TSC.RequestOptions.Field.Name,
+                                         TSC.RequestOptions.Operator.Equals,
+                                         workbook_name))
+        if _can_filter_on(project.name):
+            req_option.filter.add(TSC.Filter(TSC.RequestOptions.Field.ProjectName,
+                                             TSC.RequestOptions.Operator.Equals,
+                                             project.name))
+
+    def is_match(wb):
+        return wb.project_id == project.id and wb.name == workbook_name
+    try:
+        workbook_to_download = next((wb for wb in TSC.Pager(server.workbooks, req_option) if is_match(wb)), None)
+    except TSC.ServerResponseError as e:
+        log_message(f"Workbook filter was rejected ({e}); scanning all workbooks instead.")
+        workbook_to_download = next((wb for wb in TSC.Pager(server.workbooks) if is_match(wb)), None)
+
+    if not workbook_to_download:
         log_message(f"ERROR: Workbook '{workbook_name}' not found in project '{project.name}'.")
         return None
-    
-    workbook_to_download = matching_workbooks[0]
 
-    # ---- FIX STARTS HERE ----
-    # Define a BASE path WITHOUT the extension.
-    base_download_path = os.path.join(LOCAL_DIRECTORY, f"source_{workbook_name}")
-    # Define the EXPECTED final path WITH the extension. This is what we will check for.
-    expected_download_path = base_download_path + ".twbx"
-    
+    base_download_path = os.path.join(work_dir, f"source_{workbook_name}")
+
     try:
         log_message(f"Downloading workbook ID '{workbook_to_download.id}' to base path '{base_download_path}'...")
-        # Pass the BASE path to the download function.
-        server.workbooks.download(workbook_to_download.id, filepath=base_download_path)
-
-        # Wait loop to ensure the file exists on disk before proceeding.
-        max_wait_seconds = 20 # Increased wait time slightly for larger files
-        for i in range(max_wait_seconds):
-            # Check for the existence of the EXPECTED path.
-            if os.path.exists(expected_download_path):
-                log_message(f"SUCCESS: Workbook downloaded and file is present on disk (waited {i+1}s).")
-                return expected_download_path # Return the full, correct path
-            
-            time.sleep(1)
-        
-        # If the loop finishes without finding the file, it's an error.
-        log_message(f"ERROR: Download timed out. File not found at '{expected_download_path}' after {max_wait_seconds} seconds.")
-        return None
-    # ---- FIX ENDS HERE ----
+        # download() is synchronous and returns the path it wrote, including the extension it chose.
+        downloaded_path = server.workbooks.download(workbook_to_download.id, filepath=base_download_path)
+
+        if not downloaded_path or not os.path.exists(downloaded_path):
+            log_message(f"ERROR: Download failed. File not found at '{downloaded_path}'.")
+            return None
+
+        log_message(f"SUCCESS: Workbook downloaded to '{downloaded_path}'.")
+        return downloaded_path
     except Exception as e:
         log_message(f"ERROR: An exception occurred during download. {e}")
         return None
 
-def modify_and_repackage_workbook(twbx_path, workbook_name, find_str, replace_str):
-    """Unzips, modifies the TWB, and re-zips the workbook."""
-    extract_folder = os.path.join(LOCAL_DIRECTORY, f"{workbook_name}_extracted")
-    modified_twbx_path = os.path.join(LOCAL_DIRECTORY, f"modified_{workbook_name}.twbx")
+# One preallocated copy buffer per thread, reused for every archive member instead of allocating per read.
+_COPY_BUFFERS = threading.local()
 
-    log_message(f"Extracting '{twbx_path}' to '{extract_folder}'...")
-    try:
-        if os.path.exists(extract_folder):
-            shutil.rmtree(extract_folder)
-        os.makedirs(extract_folder)
-        with zipfile.ZipFile(twbx_path, 'r') as zip_ref:
-            zip_ref.extractall(extract_folder)
-    except Exception as e:
-        log_message(f"ERROR: Failed to extract TWBX file. {e}")
-        return None
+def _stream_copy(src, dst, length=None):
+    """Copies up to length bytes (or until EOF) from src to dst through the thread's reusable buffer."""
+    buf = getattr(_COPY_BUFFERS, "view", None)
+    if buf is None:
+        buf = _COPY_BUFFERS.view = memoryview(bytearray(COPY_BUFFER_SIZE))
 
-    twb_file_path = None
-    for file in os.listdir(extract_folder):
-        if file.lower().endswith('.twb'):
-            twb_file_path = os.path.join(extract_folder, file)
+    copied = 0
+    while length is None or copied < length:
+        view = buf if length is None else buf[:min(len(buf), length - copied)]
+        n = src.readinto(view)
+        if not n:
             break
-            
-    if not twb_file_path:
-        log_message("ERROR: No .twb file found in the extracted contents.")
-        shutil.rmtree(extract_folder)
-        return None
-        
-    log_message(f"Found TWB file: '{twb_file_path}'. Modifying URL...")
-    
-    try:
-        with open(twb_file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        if find_str not in content:
-            log_message(f"WARNING: The 'find' string was not found in the workbook XML. The file will be re-packaged without changes.")
-            log_message(f"String not found: '{find_str}'")
-
-        modified_content = content.replace(find_str, replace_str)
-        
-        with open(twb_file_path, 'w', encoding='utf-8') as f:
-            f.write(modified_content)
-        log_message("SUCCESS: URL replacement complete.")
-    except Exception as e:
-        log_message(f"ERROR: Failed to read or write the TWB file. {e}")
-        shutil.rmtree(extract_folder)
-        return None
-
-    log_message(f"Re-packaging contents into '{modified_twbx_path}'...")
+        dst.write(view[:n])
+        copied += n
+    return copied
+
+def _copy_compressed_member(zin, zout, info):
+    """Copies a ZIP member's compressed bytes verbatim, skipping the inflate/deflate round trip."""
+    zin.fp.seek(info.header_offset)
+    fheader = struct.unpack(zipfile.structFileHeader, zin.fp.read(zipfile.sizeFileHeader))
+    if fheader[zipfile._FH_SIGNATURE] != zipfile.stringFileHeader:
+        raise zipfile.BadZipFile(f"Bad local file header for '{info.filename}'")
+    zin.fp.seek(fheader[zipfile._FH_FILENAME_LENGTH] + fheader[zipfile._FH_EXTRA_FIELD_LENGTH], os.SEEK_CUR)
+
+    # Sizes and CRC are already known, so the local header carries them and no data descriptor is needed.
+    new_info = copy.copy(info)
+    new_info.flag_bits &= ~zipfile._MASK_USE_DATA_DESCRIPTOR
+    new_info.extra = zipfile._strip_extra(info.extra, (1,))
+    zip64 = info.file_size > zipfile.ZIP64_LIMIT or info.compress_size > zipfile.ZIP64_LIMIT
+
+    zout.fp.seek(zout.start_dir)
+    new_info.header_offset = zout.fp.tell()
+    zout._writecheck(new_info)
+    zout._didModify = True
+    zout.fp.write(new_info.FileHeader(zip64))
+
+    if _stream_copy(zin.fp, zout.fp, info.compress_size) != info.compress_size:
+        raise zipfile.BadZipFile(f"Truncated data for '{info.filename}'")
+
+    zout.start_dir = zout.fp.tell()
+    zout.filelist.append(new_info)
+    zout.NameToInfo[new_info.filename] = new_info
+
+def _stream_replace(src, dst, find_bytes, replace_bytes, chunk_size=COPY_BUFFER_SIZE):
+    """Copies src to dst in chunks, replacing find_bytes on the fly. Returns the number of replacements."""
+    if not find_bytes:
+        shutil.copyfileobj(src, dst, chunk_size)
+        return 0
+
+    # Hold back enough bytes to catch a match that straddles two chunks.
+    overlap = len(find_bytes) - 1
+    replacements = 0
+    pending = b''
+    while True:
+        chunk = src.read(chunk_size)
+        if not chunk:
+            break
+        buf = pending + chunk
+        pos = 0
+        while True:
+            hit = buf.find(find_bytes, pos)
+            if hit == -1:
+                break
+            dst.write(buf[pos:hit])
+            dst.write(replace_bytes)
+            pos = hit + len(find_bytes)
+            replacements += 1
+        cut = max(pos, len(buf) - overlap)
+        dst.write(buf[pos:cut])
+        pending = buf[cut:]
+    dst.write(pending)
+    return replacements
+
+def modify_and_repackage_workbook(twbx_path, workbook_name, find_str, replace_str, work_dir=LOCAL_DIRECTORY):
+    """Streams the TWBX into a new archive, modifying only the TWB entry."""
+    modified_twbx_path = os.path.join(work_dir, f"modified_{workbook_name}.twbx")
+
+    log_message(f"Re-packaging '{twbx_path}' into '{modified_twbx_path}'...")
     try:
-        with zipfile.ZipFile(modified_twbx_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for root, _, files in os.walk(extract_folder):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, extract_folder)
-                    zipf.write(file_path, arcname)
+        with zipfile.ZipFile(twbx_path, 'r') as zin:
+            twb_member = find_member_by_extension(zin, '.twb')
+            if not twb_member:
+                log_message("ERROR: No .twb file found in the workbook archive.")
+                return None
+
+            with zipfile.ZipFile(modified_twbx_path, 'w', zipfile.ZIP_DEFLATED) as zout:
+                for info in zin.infolist():
+                    if info.filename != twb_member:
+                        # Untouched members (e.g. .hyper extracts) keep their original compressed bytes.
+                        _copy_compressed_member(zin, zout, info)
+                        continue
+
+                    log_message(f"Found TWB file: '{info.filename}'. Modifying URL...")
+                    # Read through the source entry as stored; write through a fresh entry, since zout.open
+                    # resets the CRC, sizes and flags of whatever ZipInfo it is given.
+                    twb_info = zipfile.ZipInfo(info.filename, info.date_time)
+                    twb_info.compress_type = zipfile.ZIP_DEFLATED
+                    twb_info.external_attr = info.external_attr
+                    with zin.open(info) as src, zout.open(twb_info, 'w') as dst:
+                        replacements = _stream_replace(src, dst, find_str.encode('utf-8'), replace_str.encode('utf-8'))
+
+                    if not replacements:
+                        log_message(f"WARNING: The 'find' string was not found in the workbook XML. The file was re-packaged without changes.")
+                        log_message(f"String not found: '{find_str}'")
+                    else:
+                        log_message(f"SUCCESS: URL replacement complete ({replacements} occurrence(s)).")
         log_message("SUCCESS: Workbook re-packaged.")
     except Exception as e:
         log_message(f"ERROR: Failed to create new TWBX file. {e}")
-        shutil.rmtree(extract_folder)
         return None
 
-    shutil.rmtree(extract_folder)
     return modified_twbx_path
 
 def publish_modified_workbook(server, twbx_path, workbook_name, project_name):
@@ -277,75 +582,94 @@ def publish_modified_workbook(server, twbx_path, workbook_name, project_name):
 
 # ------------- ORIGINAL SCRIPT FUNCTIONS (UNCHANGED, FOR REFERENCE AND INTERACTIVE MODE) -------------
 def get_all_datasources(server):
-    all_datasources = []
-    page_number = 1
-    page_size = 1000
-    while True:
-        req_options = TSC.RequestOptions(pagenumber=page_number, pagesize=page_size)
-        datasources, _ = server.datasources.get(req_options)
-        all_datasources.extend(datasources)
-        if len(datasources) < page_size:
-            break
-        page_number += 1
-    return all_datasources
+    """Lazily iterates every datasource on the site, fetching one page at a time."""
+    return TSC.Pager(server.datasources, TSC.RequestOptions(pagesize=1000))
+
+def _find_by_name(endpoint, name):
+    """Looks up a single item by exact name using a server-side filter instead of listing everything."""
+    if _can_filter_on(name):
+        req_option = TSC.RequestOptions()
+        req_option.filter.add(TSC.Filter(TSC.RequestOptions.Field.Name,
+                                         TSC.RequestOptions.Operator.Equals,
+                                         name))
+        try:
+            items, _ = endpoint.get(req_option)
+            return next((item for item in items if item.name == name), None)
+        except TSC.ServerResponseError as e:
+            log_message(f"Name filter for '{name}' was rejected ({e}); scanning all items instead.")
+    return next((item for item in TSC.Pager(endpoint) if item.name == name), None)
+
+def find_datasource_by_name(server, datasource_name):
+    return _find_by_name(server.datasources, datasource_name)
 
 def print_all_datasources():
     env = input("Enter environment (QA/PROD/DEV) to list datasources: ").strip().upper()
     server = authenticate(env)
-    datasources = get_all_datasources(server)
-    if not datasources:
+    found = False
+    for ds in get_all_datasources(server):
+        if not found:
+            log_message(f"\nDatasources in {env} environment:")
+            found = True
+        log_message(f"  - Name: {ds.name}, ID: {ds.id}")
+    if not found:
         log_message(f"No datasources found in {env} environment.")
-    else:
-        log_message(f"\nDatasources in {env} environment:")
-        for ds in datasources:
-            log_message(f"  - Name: {ds.name}, ID: {ds.id}")
-    server.auth.sign_out()
+    sign_out(server)
 
 def download_and_extract_tdsx(server, datasource_name, include_extract=True):
     ensure_local_directory()
-    datasources = get_all_datasources(server)
-    datasource = next((ds for ds in datasources if ds.name == datasource_name), None)
+    datasource = find_datasource_by_name(server, datasource_name)
     if not datasource:
         log_message(f"ERROR: Datasource '{datasource_name}' not found on server.")
         return None, None, None
     base_download_path = os.path.join(LOCAL_DIRECTORY, datasource.name)
-    expected_download_path = base_download_path + ".tdsx"
     try:
-        server.datasources.download(datasource.id, filepath=base_download_path, include_extract=include_extract)
+        # download() returns once the file is written, with the extension the server chose.
+        expected_download_path = server.datasources.download(datasource.id, filepath=base_download_path, include_extract=include_extract)
     except Exception as e:
         log_message(f"ERROR during download: {e}")
         return None, None, None
-    if not os.path.exists(expected_download_path):
+    if not expected_download_path or not os.path.exists(expected_download_path):
         log_message(f"ERROR: Download failed. Expected file '{expected_download_path}' was not found.")
         return None, None, None
     extraction_folder = os.path.join(LOCAL_DIRECTORY, f"{datasource.name}_extracted")
     try:
-        if os.path.exists(extraction_folder):
-            shutil.rmtree(extraction_folder)
+        remove_tree(extraction_folder)
         os.makedirs(extraction_folder)
         with zipfile.ZipFile(expected_download_path, 'r') as zip_ref:
-            zip_ref.extractall(extraction_folder)
+            extract_archive(zip_ref, extraction_folder)
+            tds_member = find_member_by_extension(zip_ref, ".tds")
     except zipfile.BadZipFile:
         log_message("ERROR: Extraction failed! The file is not a valid ZIP archive.")
         return None, None, None
-    tds_file = None
-    for root, dirs, files in os.walk(extraction_folder):
-        for file in files:
-            if file.lower().endswith(".tds"):
-                tds_file = os.path.join(root, file)
-                break
-        if tds_file: break
+    tds_file = os.path.join(extraction_folder, tds_member) if tds_member else None
     if not tds_file or not os.path.exists(tds_file):
         log_message("ERROR: Extracted TDS file not found.")
         return expected_download_path, extraction_folder, None
     return expected_download_path, extraction_folder, tds_file
 
-def find_hyper_file(extraction_folder):
-    for root, dirs, files in os.walk(extraction_folder):
-        for file in files:
-            if file.lower().endswith(".hyper"):
-                return os.path.join(root, file)
-    return None
+def extract_archive(zip_ref, extraction_folder):
+    """Extracts every member through the reusable copy buffer, skipping entries that escape the folder."""
+    root = os.path.abspath(extraction_folder)
+    for info in zip_ref.infolist():
+        target = os.path.abspath(os.path.join(root, info.filename))
+        if os.path.commonpath([root, target]) != root:
+            log_message(f"WARNING: Skipping archive member outside the extraction folder: '{info.filename}'")
+            continue
+        if info.is_dir():
+            os.makedirs(target, exist_ok=True)
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with zip_ref.open(info) as src, open(target, 'wb') as dst:
+            _stream_copy(src, dst)
+
+def find_member_by_extension(zip_ref, extension):
+    """Returns the first archive member name ending with the extension, without touching the filesystem."""
+    return next((name for name in zip_ref.namelist() if name.lower().endswith(extension)), None)
+
+def find_hyper_file(archive_path, extraction_folder):
+    with zipfile.ZipFile(archive_path, 'r') as zip_ref:
+        hyper_member = find_member_by_extension(zip_ref, ".hyper")
+    return os.path.join(extraction_folder, hyper_member) if hyper_member else None
 
 def create_deployment_package(view_name, source_env):
     log_message("Function 'create_deployment_package' is part of the original script.")
@@ -356,22 +680,22 @@ def create_deployment_package(view_name, source_env):
     if not dep_extract_folder: return None
     act_tdsx_path, act_extract_folder, act_tds_path = download_and_extract_tdsx(server, actual_ds_name, include_extract=False)
     if not act_tds_path: return None
-    server.auth.sign_out()
+    sign_out(server)
     package_dir = os.path.join(LOCAL_DIRECTORY, f"packaged_{view_name}")
-    if os.path.exists(package_dir): shutil.rmtree(package_dir)
+    remove_tree(package_dir)
     os.makedirs(package_dir)
     dest_tds_path = os.path.join(package_dir, f"{view_name}.tds")
-    shutil.copy(act_tds_path, dest_tds_path)
     extracts_dir = os.path.join(package_dir, "Data", "Extracts")
     os.makedirs(extracts_dir, exist_ok=True)
-    dep_hyper_file = find_hyper_file(dep_extract_folder)
+    dep_hyper_file = find_hyper_file(dep_tdsx_path, dep_extract_folder)
     if not dep_hyper_file: return None
     shutil.copy(dep_hyper_file, extracts_dir)
     hyper_filename = os.path.basename(dep_hyper_file)
-    with open(dest_tds_path, "r", encoding="utf-8") as f: tds_content = f.read()
-    pattern = re.compile(r"(dbname\s*=\s*')([^']+\.hyper)(')")
-    tds_updated = pattern.sub(lambda m: m.group(1) + f"Data\\Extracts\\{hyper_filename}" + m.group(3), tds_content)
-    with open(dest_tds_path, "w", encoding="utf-8") as f: f.write(tds_updated)
+    # Rewrite the TDS as raw bytes straight into the package; no decode/encode round trip or intermediate copy.
+    with open(act_tds_path, "rb") as f: tds_content = f.read()
+    hyper_dbname = f"Data\\Extracts\\{hyper_filename}".encode("utf-8")
+    tds_updated = HYPER_DBNAME_PATTERN.sub(lambda m: m.group(1) + hyper_dbname + m.group(3), tds_content)
+    with open(dest_tds_path, "wb") as f: f.write(tds_updated)
     destination_tdsx = os.path.join(LOCAL_DIRECTORY, f"destination_{view_name}.tdsx")
     with zipfile.ZipFile(destination_tdsx, "w", zipfile.ZIP_DEFLATED) as zipf:
         for foldername, subfolders, filenames in os.walk(package_dir):
@@ -392,40 +716,38 @@ def deploy_package_to_env():
     dest_datasource_name = input(f"Enter the destination datasource name (default: '{view_name}'): ").strip() or view_name
     server = authenticate(dest_env)
     dest_project = find_project_by_name(server, dest_project_name)
-    if not dest_project: log_message(f"Project '{dest_project_name}' not found."); server.auth.sign_out(); return
+    if not dest_project: log_message(f"Project '{dest_project_name}' not found."); sign_out(server); return
     new_ds_item = TSC.DatasourceItem(dest_project.id, name=dest_datasource_name)
     try:
         published_ds = server.datasources.publish(new_ds_item, destination_file, TSC.Server.PublishMode.CreateNew)
         log_message(f"SUCCESS: Datasource '{published_ds.name}' deployed.")
     except Exception as e:
         log_message(f"ERROR during deployment: {e}")
-    server.auth.sign_out()
+    sign_out(server)
 
 def download_workbook(server, workbook_name):
-    workbooks, _ = server.workbooks.get()
-    wb = next((wb for wb in workbooks if wb.name == workbook_name), None)
+    wb = _find_by_name(server.workbooks, workbook_name)
     if not wb: log_message(f"ERROR: Workbook '{workbook_name}' not found on server."); return None
     base_download_path = os.path.join(LOCAL_DIRECTORY, workbook_name)
-    expected_download_path = base_download_path + ".twbx"
     try:
-        server.workbooks.download(wb.id, filepath=base_download_path)
+        expected_download_path = server.workbooks.download(wb.id, filepath=base_download_path)
     except Exception as e:
         log_message(f"ERROR during workbook download: {e}"); return None
-    if not os.path.exists(expected_download_path): log_message(f"ERROR: Download failed."); return None
+    if not expected_download_path or not os.path.exists(expected_download_path): log_message(f"ERROR: Download failed."); return None
     log_message(f"SUCCESS: Downloaded workbook to {expected_download_path}.")
     return expected_download_path
 
 def deploy_workbook(workbook_file, dest_env, project_name, workbook_name):
     server = authenticate(dest_env)
     dest_project = find_project_by_name(server, project_name)
-    if not dest_project: log_message(f"ERROR: Project '{project_name}' not found."); server.auth.sign_out(); return
+    if not dest_project: log_message(f"ERROR: Project '{project_name}' not found."); sign_out(server); return
     new_wb_item = TSC.WorkbookItem(dest_project.id, name=workbook_name)
     try:
         published_wb = server.workbooks.publish(new_wb_item, workbook_file, TSC.Server.PublishMode.CreateNew)
         log_message(f"SUCCESS: Workbook '{published_wb.name}' deployed successfully.")
     except Exception as e:
         log_message(f"ERROR during workbook deployment: {e}")
-    server.auth.sign_out()
+    sign_out(server)
 
 # ------------- MAIN MENU (for interactive use) -------------
 def main():
@@ -454,16 +776,19 @@ def cli():
     parser.add_argument(
         '--config',
         required=False,
-        help='Path to the JSON configuration file for workbook migration.'
+        help='Path to the JSON configuration file for workbook migration (a single object or a list of them).'
     )
     args = parser.parse_args()
 
     if args.config:
         log_message(f"Configuration file provided: {args.config}")
         try:
-            with open(args.config, 'r') as f:
-                config_data = json.load(f)
-            process_workbook_migration(config_data)
+            with open(args.config, 'rb') as f:
+                config_data = _json_loads(f.read())
+            if isinstance(config_data, list):
+                process_workbook_migrations(config_data)
+            else:
+                process_workbook_migration(config_data)
         except FileNotFoundError:
             log_message(f"ERROR: Configuration file not found at '{args.config}'")
         except json.JSONDecodeError:
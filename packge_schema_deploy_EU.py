@@ -1,8 +1,20 @@
 import boto3
 import json
 import time
+import asyncio
 import logging
 import argparse
+import functools
+import threading
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from tenacity import AsyncRetrying, Retrying, retry_if_exception, stop_after_attempt, wait_exponential_jitter
+
+try:
+    # Optional: only needed for --async-views (deploy(..., use_async=True)), which submits views on an event loop.
+    import aioboto3
+except ImportError:
+    aioboto3 = None
 
 logging.basicConfig(
     level=logging.INFO,
@@ -15,6 +27,64 @@ AWS_REGION = "eu-west-1"
 S3_ATHENA_OUTPUT_LOCATION = "s3://aws-athena-query-results-825130385159-eu-west-1/ProdEU.Revealv2-Deployment-Role/"
 #S3_ATHENA_OUTPUT_LOCATION = "s3://aws-athena-query-results-889340682220-us-east-1/ProdUS.Revealv2-Deployment-Role/" # From your logs
 ATHENA_WORKGROUP = "primary"
+# Botocore clients are thread-safe and shared by the folder runner's parallel deploys, so the pool is sized for
+# several view batches at once; keep-alive stops idle pooled connections being dropped between polls.
+AWS_CLIENT_CONFIG = Config(
+    max_pool_connections=64,
+    retries={"max_attempts": 10, "mode": "adaptive"},
+    tcp_keepalive=True,
+    connect_timeout=5,
+    read_timeout=30
+)
+# View batches are polled with batch_get_query_execution: 0.25s doubling to 2s between polls, for up to 10 minutes.
+ATHENA_BATCH_SIZE = 50  # batch_get_query_execution limit
+ATHENA_BATCH_POLL_MAX_DELAY = 2
+ATHENA_BATCH_POLL_TIMEOUT = 600
+
+ATHENA_THROTTLING_CODES = {"ThrottlingException", "TooManyRequestsException"}
+
+def is_athena_throttling(exception):
+    return isinstance(exception, ClientError) and exception.response.get('Error', {}).get('Code') in ATHENA_THROTTLING_CODES
+
+# Athena caps concurrent DDL per account and botocore's own retries give up within seconds, so a wide view
+# fan-out backs off here (jittered, up to 30s) before a throttled submission fails the view.
+ATHENA_THROTTLING_RETRY = dict(
+    stop=stop_after_attempt(6),
+    wait=wait_exponential_jitter(initial=1, max=30),
+    retry=retry_if_exception(is_athena_throttling),
+    before_sleep=lambda retry_state: logging.warning(
+        f"Athena throttled the query submission (attempt {retry_state.attempt_number}), "
+        f"retrying in {retry_state.next_action.sleep:.1f}s."
+    ),
+    reraise=True
+)
+
+# One session and one client per service for the whole process, so batched runs parse each
+# service model once. boto3 sessions are not thread-safe, hence the lock around client creation.
+_SESSION = boto3.Session(region_name=AWS_REGION)
+_CLIENT_LOCK = threading.Lock()
+
+@functools.lru_cache(maxsize=None)
+def _cached_client(service_name):
+    return _SESSION.client(service_name, config=AWS_CLIENT_CONFIG)
+
+def get_aws_client(service_name):
+    with _CLIENT_LOCK:
+        return _cached_client(service_name)
+
+@functools.lru_cache(maxsize=None)
+def _cached_async_session():
+    return aioboto3.Session(region_name=AWS_REGION)
+
+def get_async_session():
+    with _CLIENT_LOCK:
+        return _cached_async_session()
+
+def get_athena():
+    return get_aws_client('athena')
+
+def get_glue():
+    return get_aws_client('glue')
 
 def load_config(config_path):
     try:
@@ -29,178 +99,299 @@ def load_config(config_path):
         logging.error(f"Invalid JSON in configuration file: {config_path}")
         raise
 
-def execute_athena_query(athena_client, query, database_name=None):
+def start_athena_query(athena_client, query, database_name=None):
     logging.info(f"Executing Athena Query: {query[:300]}{'...' if len(query) > 300 else ''}")
     query_execution_context = {}
     if database_name:
         query_execution_context['Database'] = database_name
 
-    query_execution_id = None
     try:
-        response = athena_client.start_query_execution(
-            QueryString=query,
-            QueryExecutionContext=query_execution_context,
-            ResultConfiguration={'OutputLocation': S3_ATHENA_OUTPUT_LOCATION},
-            WorkGroup=ATHENA_WORKGROUP
-        )
-        query_execution_id = response['QueryExecutionId']
-        logging.info(f"Query '{query_execution_id}' started.")
-
-        while True:
-            stats = athena_client.get_query_execution(QueryExecutionId=query_execution_id)
-            status = stats['QueryExecution']['Status']['State']
-            if status in ['SUCCEEDED', 'FAILED', 'CANCELLED']:
-                if status == 'SUCCEEDED':
-                    logging.info(f"Query '{query_execution_id}' SUCCEEDED.")
-                else:
-                    error_message = stats['QueryExecution']['Status'].get('StateChangeReason', 'Unknown error')
-                    logging.error(f"Query '{query_execution_id}' {status}. Reason: {error_message}")
-                    raise Exception(f"Athena query {status}: {error_message}")
-                break
-            logging.debug(f"Query '{query_execution_id}' status: {status}. Waiting...")
-            time.sleep(5)
-        return query_execution_id
+        for attempt in Retrying(**ATHENA_THROTTLING_RETRY):
+            with attempt:
+                response = athena_client.start_query_execution(
+                    QueryString=query,
+                    QueryExecutionContext=query_execution_context,
+                    ResultConfiguration={'OutputLocation': S3_ATHENA_OUTPUT_LOCATION},
+                    WorkGroup=ATHENA_WORKGROUP
+                )
     except Exception as e:
-        logging.error(f"Error executing Athena query (ID: {query_execution_id if query_execution_id else 'N/A'}): {e}")
+        logging.error(f"Error executing Athena query (ID: N/A): {e}")
         raise
+    query_execution_id = response['QueryExecutionId']
+    logging.info(f"Query '{query_execution_id}' started.")
+    return query_execution_id
 
-def check_schema_exists(glue_client, schema_name):
-    try:
-        glue_client.get_database(Name=schema_name)
-        logging.info(f"Schema '{schema_name}' (in awsdatacatalog) already exists.")
-        return True
-    except glue_client.exceptions.EntityNotFoundException:
-        logging.info(f"Schema '{schema_name}' (in awsdatacatalog) does not exist.")
-        return False
-    except Exception as e:
-        logging.error(f"Error checking schema '{schema_name}' (in awsdatacatalog): {e}")
-        raise
-
-# --- MODIFIED FUNCTION with simplified ARN fetch ---
-def create_schema_with_glue(glue_client, athena_client, schema_name, description, tags):
+# --- MODIFIED FUNCTION: tags applied by create_database, merged onto existing schemas ---
+def create_schema_with_glue(glue_client, schema_name, description, tags):
     """
     Creates an Athena schema (Glue Database) using Glue API.
-    Tags are applied in a separate call if provided and ARN is retrieved promptly.
+    Tags, if provided, are applied by the same create_database call, or merged onto the schema if it already exists.
     """
-    if check_schema_exists(glue_client, schema_name):
-        logging.warning(f"Schema '{schema_name}' already exists. Skipping creation and tagging.")
-        return
-
     logging.info(f"Attempting to create schema '{schema_name}' (in awsdatacatalog) via Glue API.")
-    database_arn = None
     try:
-        glue_client.create_database(
-            DatabaseInput={ # CatalogId implicitly current account
+        create_args = {
+            'DatabaseInput': { # CatalogId implicitly current account
                 'Name': schema_name,
                 'Description': description
             }
-        )
+        }
+        if tags:
+            create_args['Tags'] = tags
+        glue_client.create_database(**create_args)
         logging.info(f"Schema '{schema_name}' created successfully via Glue API.")
+        if tags:
+            logging.info(f"Tags applied to schema '{schema_name}' at creation: {tags}")
+        else:
+            logging.info(f"No tags provided for schema '{schema_name}'. Skipping tagging.")
+    except glue_client.exceptions.AlreadyExistsException:
+        logging.warning(f"Schema '{schema_name}' already exists (detected during Glue create_database call).")
+        if tags:
+            # tag_resource merges, so re-runs converge the tags without touching any others on the schema
+            try:
+                account_id = glue_client.get_database(Name=schema_name)['Database']['CatalogId']
+                database_arn = f"arn:{glue_client.meta.partition}:glue:{AWS_REGION}:{account_id}:database/{schema_name}"
+                glue_client.tag_resource(ResourceArn=database_arn, TagsToAdd=tags)
+                logging.info(f"Tags applied to existing schema '{schema_name}': {tags}")
+            except Exception as e:
+                logging.error(f"Error tagging existing schema '{schema_name}': {e}")
+                raise
+    except Exception as e:
+        logging.error(f"Error during schema '{schema_name}' creation: {e}")
+        raise
+# --- END OF MODIFIED FUNCTION ---
 
-        # Attempt to get ARN for tagging after a short delay
-        logging.info(f"Waiting 10 seconds for Glue eventual consistency before attempting ARN retrieval for '{schema_name}'...")
-        time.sleep(10) # Wait 10 seconds
+def record_finished_views(response, pending_views):
+    """
+    Removes the finished queries in a batch_get_query_execution response from {query execution id: view name}
+    and logs each result. Returns the number of views that failed.
+    """
+    failed_views = 0
+    for query_execution in response.get('QueryExecutions', []):
+        status = query_execution['Status']
+        if status['State'] not in ('SUCCEEDED', 'FAILED', 'CANCELLED'):
+            continue
+        view_name_for_log = pending_views.pop(query_execution['QueryExecutionId'])
+        if status['State'] == 'SUCCEEDED':
+            logging.info(f"View '{view_name_for_log}' created/replaced successfully.")
+        else:
+            error_message = status.get('StateChangeReason', 'Unknown error')
+            logging.error(f"Failed to create/replace view '{view_name_for_log}': Athena query {status['State']}: {error_message}")
+            failed_views += 1
+    # Anything in UnprocessedQueryExecutionIds is still pending and is asked for again on the next poll
+    return failed_views
 
+def report_unfinished_views(pending_views):
+    for view_name_for_log in pending_views.values():
+        logging.error(f"Failed to create/replace view '{view_name_for_log}': Athena query did not finish within the polling budget.")
+    return len(pending_views)
+
+def wait_for_views(athena_client, pending_views):
+    """
+    Polls every pending view query with batch_get_query_execution (up to 50 IDs per call) instead of one
+    get_query_execution stream per query. Returns the number of views that failed.
+    """
+    failed_views = 0
+    deadline = time.monotonic() + ATHENA_BATCH_POLL_TIMEOUT
+    poll = 0
+    while pending_views:
+        query_execution_ids = list(pending_views)
+        for i in range(0, len(query_execution_ids), ATHENA_BATCH_SIZE):
+            response = athena_client.batch_get_query_execution(QueryExecutionIds=query_execution_ids[i:i + ATHENA_BATCH_SIZE])
+            failed_views += record_finished_views(response, pending_views)
+        if not pending_views:
+            break
+        if time.monotonic() >= deadline:
+            return failed_views + report_unfinished_views(pending_views)
+        time.sleep(min(0.25 * 2 ** poll, ATHENA_BATCH_POLL_MAX_DELAY))
+        poll += 1
+    return failed_views
+
+def create_views(athena_client, view_ddls, target_schema):
+    # Athena runs one statement per StartQueryExecution, so the batch is submitted back to back over the
+    # client's pooled connection and then every query is polled together.
+    # Returns True if every view was created/replaced.
+    failed_views = 0
+    pending_views = {}
+    for view_name_for_log, view_ddl in view_ddls:
         try:
-            logging.info(f"Attempting to retrieve ARN for database '{schema_name}' for tagging.")
-            db_details = glue_client.get_database(Name=schema_name) # CatalogId implicitly current account
-            database_arn = db_details['Database'].get('ARN')
-            if database_arn:
-                logging.info(f"Successfully retrieved ARN for '{schema_name}': {database_arn}")
-            else:
-                logging.warning(f"ARN not found in get_database response for '{schema_name}' after delay. Skipping tagging.")
+            pending_views[start_athena_query(athena_client, view_ddl, database_name=target_schema)] = view_name_for_log
         except Exception as e:
-            logging.warning(f"Error retrieving database ARN for '{schema_name}' after delay, cannot apply tags: {e}")
-            database_arn = None # Ensure it's None if retrieval failed
+            logging.error(f"Failed to create/replace view '{view_name_for_log}': {e}")
+            failed_views += 1
 
+    try:
+        failed_views += wait_for_views(athena_client, pending_views)
+    except Exception as e:
+        logging.error(f"Error polling Athena for the views in '{target_schema}': {e}")
+        failed_views += len(pending_views)
+    return failed_views == 0
 
-        # Apply tags if they are provided and the database_arn was obtained
-        if tags and database_arn:
-            logging.info(f"Attempting to apply tags to schema '{schema_name}' (ARN: {database_arn}): {tags}")
-            glue_client.tag_resource(ResourceArn=database_arn, TagsToAdd=tags)
-            logging.info(f"Tags successfully applied to schema '{schema_name}'.")
-        elif not tags:
-            logging.info(f"No tags provided for schema '{schema_name}'. Skipping tagging.")
-        elif not database_arn and tags: # If tags were provided but ARN is missing
-            logging.warning(f"Tags were provided for '{schema_name}', but its ARN could not be determined after delay. Tags NOT applied.")
+async def start_athena_query_async(athena_client, query, database_name=None):
+    logging.info(f"Executing Athena Query: {query[:300]}{'...' if len(query) > 300 else ''}")
+    query_execution_context = {}
+    if database_name:
+        query_execution_context['Database'] = database_name
 
+    try:
+        async for attempt in AsyncRetrying(**ATHENA_THROTTLING_RETRY):
+            with attempt:
+                response = await athena_client.start_query_execution(
+                    QueryString=query,
+                    QueryExecutionContext=query_execution_context,
+                    ResultConfiguration={'OutputLocation': S3_ATHENA_OUTPUT_LOCATION},
+                    WorkGroup=ATHENA_WORKGROUP
+                )
+    except Exception as e:
+        logging.error(f"Error executing Athena query (ID: N/A): {e}")
+        raise
+    query_execution_id = response['QueryExecutionId']
+    logging.info(f"Query '{query_execution_id}' started.")
+    return query_execution_id
+
+async def wait_for_views_async(athena_client, pending_views):
+    # Same batched poll as wait_for_views, on the event loop
+    failed_views = 0
+    deadline = time.monotonic() + ATHENA_BATCH_POLL_TIMEOUT
+    poll = 0
+    while pending_views:
+        query_execution_ids = list(pending_views)
+        for i in range(0, len(query_execution_ids), ATHENA_BATCH_SIZE):
+            response = await athena_client.batch_get_query_execution(QueryExecutionIds=query_execution_ids[i:i + ATHENA_BATCH_SIZE])
+            failed_views += record_finished_views(response, pending_views)
+        if not pending_views:
+            break
+        if time.monotonic() >= deadline:
+            return failed_views + report_unfinished_views(pending_views)
+        await asyncio.sleep(min(0.25 * 2 ** poll, ATHENA_BATCH_POLL_MAX_DELAY))
+        poll += 1
+    return failed_views
+
+async def create_views_async(view_ddls, target_schema):
+    session = get_async_session()
+    # aioboto3 clients belong to the event loop that opened them, so each batch opens one from the shared session.
+    # Keep it open for the whole batch; closing it early would abort the in-flight polls.
+    async with session.client('athena', config=AWS_CLIENT_CONFIG) as athena_client:
+        # Submissions run concurrently on the event loop; completion is then polled in batches
+        results = await asyncio.gather(
+            *(start_athena_query_async(athena_client, view_ddl, database_name=target_schema) for _, view_ddl in view_ddls),
+            return_exceptions=True
+        )
+        failed_views = 0
+        pending_views = {}
+        for (view_name_for_log, _), result in zip(view_ddls, results):
+            if isinstance(result, Exception):
+                logging.error(f"Failed to create/replace view '{view_name_for_log}': {result}")
+                failed_views += 1
+            else:
+                pending_views[result] = view_name_for_log
 
-        # Athena recognition part
         try:
-            execute_athena_query(athena_client, f'SHOW TABLES IN "{schema_name}"', database_name=schema_name)
-            logging.info(f"Athena successfully recognized the new schema '{schema_name}'.")
+            failed_views += await wait_for_views_async(athena_client, pending_views)
         except Exception as e:
-            logging.warning(f"Athena had a minor hiccup recognizing schema '{schema_name}' immediately after creation: {e}. Proceeding...")
+            logging.error(f"Error polling Athena for the views in '{target_schema}': {e}")
+            failed_views += len(pending_views)
+    return failed_views == 0
 
-    except glue_client.exceptions.AlreadyExistsException:
-        logging.warning(f"Schema '{schema_name}' already exists (detected during Glue create_database call).")
+def build_view_ddls(config):
+    """
+    Returns (table name, CREATE OR REPLACE VIEW DDL) for every base table in a config.
+    The folder runner builds these once per config up front and passes them to deploy.
+    """
+    target_schema = config['target_schema_name']
+    source_schema = config['source_schema_name']
+    where_condition = config.get('where_condition', "").strip()
+    base_tables = config.get('base_tables', [])
+    if not isinstance(base_tables, list):
+        return []
+
+    view_ddls = []
+    for simple_table_name in base_tables:
+        view_query = f"""SELECT * FROM "awsdatacatalog"."{source_schema}"."{simple_table_name}" """
+        if where_condition:
+            view_query = f"""{view_query} WHERE {where_condition}"""
+        view_ddl = f"""CREATE OR REPLACE VIEW "awsdatacatalog"."{target_schema}"."{simple_table_name}" AS {view_query}"""
+        view_ddls.append((simple_table_name, view_ddl))
+    return view_ddls
+
+def main(config, use_async=False):
+    """
+    CLI entry point: deploys a config given as a file path or an already-parsed dict.
+    Returns 0 on success and 1 on failure, for use as the process exit code.
+    """
+    if not isinstance(config, dict):
+        try:
+            config = load_config(config)
+        except Exception:
+            return 1
+
+    try:
+        athena_client = get_athena()
+        glue_client = get_glue()
+        logging.info(f"AWS clients initialized for region {AWS_REGION}")
     except Exception as e:
-        logging.error(f"Error during schema '{schema_name}' creation or tagging process: {e}")
-        raise
-# --- END OF MODIFIED FUNCTION ---
+        logging.error(f"Failed to initialize AWS clients: {e}")
+        return 1
+
+    return 0 if deploy(config, athena_client, glue_client, use_async=use_async) else 1
 
-def main(config_file_path):
+def deploy(config, athena_client, glue_client, view_ddls=None, use_async=False):
+    """
+    Creates the config's schema and views with the given clients, so the folder runner can share them
+    across threads. With use_async, views are created through aioboto3 instead of athena_client.
+    Returns True if the schema and every view were deployed.
+    """
+    if use_async and not aioboto3:
+        logging.error("use_async requires the aioboto3 package.")
+        return False
     if not S3_ATHENA_OUTPUT_LOCATION or "your-aws-athena-query-results-bucket" in S3_ATHENA_OUTPUT_LOCATION:
         logging.warning(f"S3_ATHENA_OUTPUT_LOCATION ('{S3_ATHENA_OUTPUT_LOCATION}') might not be correctly configured with your bucket. Please verify.")
 
-    try:
-        config = load_config(config_file_path)
-    except Exception:
-        return
-
     target_schema = config['target_schema_name']
     source_schema = config['source_schema_name']
     where_condition = config.get('where_condition', "").strip()
     base_tables = config.get('base_tables', [])
     if not isinstance(base_tables, list):
         logging.error(f"'base_tables' in config file must be a list. Found: {type(base_tables)}")
-        return
+        return False
+    if view_ddls is None:
+        view_ddls = build_view_ddls(config)
 
     tags = config.get('tags', {})
     schema_description = config.get('schema_description', f"Schema for {config.get('customer_group_identifier', 'N/A')}")
 
     try:
-        athena_client = boto3.client('athena', region_name=AWS_REGION)
-        glue_client = boto3.client('glue', region_name=AWS_REGION)
-        logging.info(f"AWS clients initialized for region {AWS_REGION}")
-    except Exception as e:
-        logging.error(f"Failed to initialize AWS clients: {e}")
-        return
-
-    try:
-        create_schema_with_glue(glue_client, athena_client, target_schema, schema_description, tags)
+        create_schema_with_glue(glue_client, target_schema, schema_description, tags)
     except Exception as e:
         logging.error(f"Halting script due to error during schema creation for '{target_schema}': {e}")
-        return
+        return False
 
+    views_ok = True
     if not base_tables:
         logging.info("No base tables specified in the configuration. Skipping view creation.")
     else:
         logging.info(f"Starting view creation process for target schema '{target_schema}'. Number of tables: {len(base_tables)}")
-        for simple_table_name in base_tables:
+        pending_ddls = []
+        for simple_table_name, view_ddl in view_ddls:
             view_name_for_log = f"awsdatacatalog.{target_schema}.{simple_table_name}"
             source_object_for_log = f"awsdatacatalog.{source_schema}.{simple_table_name}"
 
             logging.info(f"Processing: CREATE VIEW {view_name_for_log} AS SELECT * FROM {source_object_for_log}")
 
-            view_ddl_core = f"""SELECT * FROM "awsdatacatalog"."{source_schema}"."{simple_table_name}" """
-
             if where_condition:
-                view_ddl = f"""CREATE OR REPLACE VIEW "awsdatacatalog"."{target_schema}"."{simple_table_name}" AS {view_ddl_core} WHERE {where_condition}"""
                 logging.info(f"View will be created with WHERE clause: {where_condition}")
             else:
-                view_ddl = f"""CREATE OR REPLACE VIEW "awsdatacatalog"."{target_schema}"."{simple_table_name}" AS {view_ddl_core}"""
                 logging.info("View will be created without a WHERE clause.")
+            pending_ddls.append((view_name_for_log, view_ddl))
 
-            try:
-                execute_athena_query(athena_client, view_ddl, database_name=target_schema)
-                logging.info(f"View '{view_name_for_log}' created/replaced successfully.")
-            except Exception as e:
-                logging.error(f"Failed to create/replace view '{view_name_for_log}': {e}")
+        if use_async:
+            views_ok = asyncio.run(create_views_async(pending_ddls, target_schema))
+        else:
+            views_ok = create_views(athena_client, pending_ddls, target_schema)
 
     logging.info("Athena schema and view management script completed.")
+    return views_ok
 def display_caller_identity():
-    sts_client = boto3.client('sts')
+    sts_client = get_aws_client('sts')
 
     response = sts_client.get_caller_identity()
 
@@ -211,6 +402,9 @@ def display_caller_identity():
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Athena Schema & View Management Script (gluecreds.py)")
     parser.add_argument("config_file_path", help="Path to the JSON configuration file (e.g., schema_request.json)")
+    parser.add_argument("--async-views", action="store_true", help="Create views with aioboto3 on an event loop (requires aioboto3)")
     args = parser.parse_args()
+    if args.async_views and not aioboto3:
+        parser.error("--async-views requires the aioboto3 package")
     display_caller_identity()
-    main(args.config_file_path)
+    raise SystemExit(main(args.config_file_path, use_async=args.async_views))
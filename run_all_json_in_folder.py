@@ -1,24 +1,61 @@
-import subprocess
 import os
 import glob
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from packge_schema_deploy import load_config, build_view_ddls, deploy, display_caller_identity, get_athena, get_glue
+
+# Number of schema configs deployed at the same time (the work is AWS-latency bound)
+MAX_WORKERS = 8
+
+def deploy_file(json_file, config, athena_client, glue_client, view_ddls):
+    print(f"\nRunning: packge_schema_deploy.deploy {json_file}")
+    return deploy(config, athena_client, glue_client, view_ddls)
 
 # Dynamically determine the path to the "US_PROD_Schema/temp" folder inside the repo
 repo_root = os.path.dirname(os.path.abspath(__file__))
 json_folder = os.path.join(repo_root, "US_PROD_Schema", "temp")
 
-# Script to execute for each JSON file
-script_to_run = os.path.join(repo_root, "packge_schema_deploy.py")
-
-# Find all .json files in the folder (non-recursively)
-json_files = glob.glob(os.path.join(json_folder, "*.json"))
-json_files.sort()
-
-# Run each file
-for json_file in json_files:
-    print(f"\nRunning: {script_to_run} {json_file}")
-    result = subprocess.run(["python3", script_to_run, json_file])
-    if result.returncode != 0:
-        print(f"Failed on: {json_file}")
-        break
-    else:
-        print(f"Success: {json_file}")
+if __name__ == "__main__":
+    # Find all .json files in the folder (non-recursively)
+    json_files = glob.glob(os.path.join(json_folder, "*.json"))
+    json_files.sort()
+
+    # Parse every config and build its view DDLs once, up front, so a bad file stops the batch before anything deploys
+    deployments = []
+    for json_file in json_files:
+        try:
+            config = load_config(json_file)
+            deployments.append((json_file, config, build_view_ddls(config)))
+        except Exception as e:
+            print(f"Failed on: {json_file} ({e})")
+            raise SystemExit(1)
+
+    # Log which AWS identity deploys the batch, as each per-file run of the script used to
+    display_caller_identity()
+
+    # Run the deploy in-process for each file instead of spawning a new interpreter per config;
+    # the AWS clients are thread-safe and shared by every worker
+    athena_client = get_athena()
+    glue_client = get_glue()
+    failed = False
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = {}
+        for json_file, config, view_ddls in deployments:
+            futures[executor.submit(deploy_file, json_file, config, athena_client, glue_client, view_ddls)] = json_file
+        for future in as_completed(futures):
+            json_file = futures[future]
+            try:
+                if not future.result():
+                    raise Exception("deploy reported a failure, see the log above")
+            except Exception as e:
+                print(f"Failed on: {json_file} ({e})")
+                # Stop the batch: configs that have not started yet are cancelled, the running ones finish
+                failed = True
+                executor.shutdown(wait=False, cancel_futures=True)
+                break
+            else:
+                print(f"Success: {json_file}")
+
+    # Non-zero exit so CI/Jenkins sees the failure
+    if failed:
+        raise SystemExit(1)
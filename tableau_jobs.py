@@ -1,13 +1,15 @@
 import tableauserverclient as TSC
+import csv
 import json
-import pandas as pd
 import os
+from operator import attrgetter
 
 # -----------------------------
 # Configuration
 # -----------------------------
 CONFIG_FILE = "tableau_config.json"
 ENVIRONMENT = "QA"  # Switch between environments if needed
+JOBS_CREATED_SINCE = None  # e.g. "2024-01-01T00:00:00Z" to only fetch jobs created on/after that time; None fetches all
 
 # -----------------------------
 # Load Tableau Server Config
@@ -38,20 +40,20 @@ with server.auth.sign_in(tableau_auth):
     print("✅ Connected to Tableau Server:", server_url)
 
     req_options = TSC.RequestOptions(pagesize=1000)
-    jobs, pagination = server.jobs.get(req_options)
-
-    job_data = [{
-        "Job ID": job.id,
-        "Status": job.status,
-        "Task Type": job.type,
-        "Progress": job.progress,
-        "Created At": job.created_at,
-        "Started At": job.started_at,
-        "Ended At": job.ended_at,
-        "Notes": job.notes
-    } for job in jobs]
-
-    df = pd.DataFrame(job_data)
+    if JOBS_CREATED_SINCE:
+        # Filtered on the server so older jobs are never downloaded
+        req_options.filter.add(TSC.Filter(
+            TSC.RequestOptions.Field.CreatedAt,
+            TSC.RequestOptions.Operator.GreaterThanOrEqual,
+            JOBS_CREATED_SINCE
+        ))
+
+    # Background jobs expose no progress/notes, so priority and title fill those columns.
+    # Rows are written as each page arrives, so a failure mid-fetch still leaves the earlier pages on disk.
+    job_fields = attrgetter("id", "status", "type", "priority", "created_at", "started_at", "ended_at", "title")
     output_file = "tableau_jobs.csv"
-    df.to_csv(output_file, index=False)
+    with open(output_file, "w", newline="", encoding="utf-8") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(["Job ID", "Status", "Task Type", "Priority", "Created At", "Started At", "Ended At", "Title"])
+        writer.writerows(job_fields(job) for job in TSC.Pager(server.jobs, req_options))
     print(f"📄 Job data saved to: {output_file}")